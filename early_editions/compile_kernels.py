@@ -0,0 +1,24 @@
+"""Ahead-of-time compile the P&L kernel used by portfolio_tracker_Tk_fails.py
+
+Run once after installing numba:
+    python compile_kernels.py
+
+This builds the portfolio_kernels extension module next to this file. The
+tracker imports it when present, so startup needs neither numba nor a JIT
+compile; without it the tracker falls back to numba's JIT or plain NumPy.
+"""
+import os
+
+from numba.pycc import CC
+
+from portfolio_tracker_Tk_fails import _pnl_kernel
+
+cc = CC('portfolio_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.export(
+    'compute_pnl',
+    'Tuple((f8[:], f8[:], f8[:], f8[:], f8, f8))(f8[:], f8[:], f8[:], f8[:])'
+)(_pnl_kernel)
+
+if __name__ == "__main__":
+    cc.compile()
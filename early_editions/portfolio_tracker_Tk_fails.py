@@ -1,11 +1,63 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import yfinance as yf
+import numpy as np
 import json
 import os
+import atexit
 from datetime import datetime, timedelta
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Prebuilt by compile_kernels.py; skips importing numba and the JIT warm-up
+    from portfolio_kernels import compute_pnl as _compute_pnl
+except ImportError:
+    _compute_pnl = None
+
+# yfinance pulls in pandas and requests, so it is imported on the first fetch
+# rather than before the window can open
+_yf_module = None
+
+def _yf():
+    """Return the yfinance module, importing it on first use"""
+    global _yf_module
+    if _yf_module is None:
+        import yfinance
+        _yf_module = yfinance
+    return _yf_module
+
+# Bound str.format methods for the table cells, looked up once instead of per f-string
+_M = "${:,.2f}".format
+_P2 = "${:.2f}".format
+_Q = "{:,.0f}".format
+_PCT = "{:+.2f}%".format
+
+
+def _pnl_kernel(qty, px, fees, cur_px):
+    """Per-row cost, value, P&L and P&L % plus the portfolio totals"""
+    total_cost = qty * px + fees
+    current_value = qty * cur_px
+    pl = current_value - total_cost
+    # A position with no cost basis shows 0% instead of dividing by zero
+    safe_cost = np.where(total_cost > 0, total_cost, 1.0)
+    pl_pct = np.where(total_cost > 0, 100.0 * pl / safe_cost, 0.0)
+    return total_cost, current_value, pl, pl_pct, total_cost.sum(), np.nansum(current_value)
+
+# No prebuilt module: JIT the kernel with numba if present, else run it as NumPy
+if _compute_pnl is None:
+    try:
+        from numba import njit
+    except ImportError:
+        _compute_pnl = _pnl_kernel
+    else:
+        _compute_pnl = njit(cache=True)(_pnl_kernel)
 
 class PortfolioTracker:
     def __init__(self, root):
@@ -13,17 +65,30 @@ class PortfolioTracker:
         self.root.title("Financial Portfolio Tracker")
         self.root.geometry("1200x700")
         
+        # Price cache to avoid too many API calls, persisted across restarts
+        self.price_cache = {}
+        self.cache_timestamp = {}
+        self._cache_path = "price_cache.json"
+        # When a refresh last priced every ticker, and whether one is running now
+        self._last_refresh = datetime.min
+        self._refreshing = False
+        # yf.Ticker objects reused across fetches, keyed by symbol
+        self._ticker_objs = {}
+        
         # Data storage
         self.portfolio = []
         self.data_file = "portfolio_data.json"
         self.load_data()
+        self._sync_arrays()
+        atexit.register(self.save_price_cache)
         
-        # Price cache to avoid too many API calls
-        self.price_cache = {}
-        self.cache_timestamp = {}
+        # Last-rendered (values, tags) per Treeview iid; each row's iid is its position's _id
+        self._row_values = {}
         
         self.setup_ui()
-        self.refresh_prices()
+        # Paint from the stored portfolio and cached prices, then refresh in the background
+        self.update_display()
+        self.refresh_prices(force=False)
         
     def setup_ui(self):
         # Main frame
@@ -126,6 +191,13 @@ class PortfolioTracker:
         self.tree.tag_configure('loss', foreground='red')
         self.tree.tag_configure('gain', foreground='green')
         
+    def _ticker(self, ticker):
+        """Return the yf.Ticker for a symbol, creating it on first use"""
+        stock = self._ticker_objs.get(ticker)
+        if stock is None:
+            stock = self._ticker_objs[ticker] = _yf().Ticker(ticker)
+        return stock
+    
     def get_current_price(self, ticker):
         """Get current price from Yahoo Finance with caching"""
         now = datetime.now()
@@ -135,19 +207,82 @@ class PortfolioTracker:
             if now - self.cache_timestamp[ticker] < timedelta(minutes=5):
                 return self.price_cache[ticker]
         
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="1d")
-            if not hist.empty:
-                current_price = hist['Close'].iloc[-1]
-                self.price_cache[ticker] = current_price
-                self.cache_timestamp[ticker] = now
-                return current_price
-            else:
+        # Older yfinance releases have no YFRateLimitError; an empty tuple matches nothing
+        rate_limit_error = getattr(getattr(_yf(), 'exceptions', None), 'YFRateLimitError', ())
+        # Retry once after a short backoff if Yahoo rate-limits us
+        for attempt in range(2):
+            try:
+                # The table shows the unadjusted close, so actions and adjustment are skipped
+                stock = self._ticker(ticker)
+                hist = stock.history(period="1d", auto_adjust=False, actions=False)
+                if not hist.empty:
+                    current_price = float(hist['Close'].iloc[-1])
+                    self.price_cache[ticker] = current_price
+                    self.cache_timestamp[ticker] = now
+                    return current_price
+                else:
+                    return None
+            except rate_limit_error as e:
+                if attempt == 0:
+                    time.sleep(1)
+                    continue
+                print(f"Error fetching price for {ticker}: {e}")
                 return None
+            except Exception as e:
+                print(f"Error fetching price for {ticker}: {e}")
+                return None
+    
+    def fetch_prices_bulk(self, tickers):
+        """Fetch current prices for several tickers in a single Yahoo Finance request"""
+        try:
+            df = _yf().download(tickers, period="1d", group_by='ticker', threads=True, progress=False)
         except Exception as e:
-            print(f"Error fetching price for {ticker}: {e}")
-            return None
+            print(f"Error fetching prices for {', '.join(tickers)}: {e}")
+            return
+        
+        if df.empty:
+            return
+        
+        now = datetime.now()
+        for ticker in tickers:
+            try:
+                closes = (df[ticker] if df.columns.nlevels > 1 else df)['Close'].dropna()
+            except KeyError:
+                continue
+            if not closes.empty:
+                self.price_cache[ticker] = float(closes.iloc[-1])
+                self.cache_timestamp[ticker] = now
+    
+    def _unique_tickers(self):
+        """Sorted, de-duplicated tickers held in the portfolio; several lots share one fetch"""
+        return sorted({p['ticker'] for p in self.portfolio})
+    
+    def _price_snapshot(self):
+        """Cached price of each held ticker, None if it has none; never fetches, as it runs on the Tk main loop"""
+        return {ticker: self.price_cache.get(ticker) for ticker in self._unique_tickers()}
+    
+    def _sync_arrays(self):
+        """Rebuild the numeric column arrays and the iid map from self.portfolio after it changes"""
+        self._by_iid = {p['_id']: p for p in self.portfolio}
+        self.qty = np.array([p['quantity'] for p in self.portfolio], dtype=np.float64)
+        self.px = np.array([p['purchase_price'] for p in self.portfolio], dtype=np.float64)
+        self.fees = np.array([p['fees'] for p in self.portfolio], dtype=np.float64)
+    
+    @staticmethod
+    def _format_static_cells(position):
+        """Pre-format the columns that do not depend on the current price"""
+        quantity = position['quantity']
+        purchase_price = position['purchase_price']
+        fees = position['fees']
+        total_cost = (quantity * purchase_price) + fees
+        position['_static_cells'] = (
+            position['description'],
+            position['ticker'],
+            _Q(quantity),
+            _P2(purchase_price),
+            _M(total_cost),
+            _P2(fees)
+        )
     
     def add_position(self):
         """Add a new position to the portfolio"""
@@ -163,7 +298,10 @@ class PortfolioTracker:
             position = dialog.result
             position['ticker'] = ticker
             position['date_added'] = datetime.now().isoformat()
+            position['_id'] = uuid.uuid4().hex
+            self._format_static_cells(position)
             self.portfolio.append(position)
+            self._sync_arrays()
             self.save_data()
             self.update_display()
             self.status_var.set(f"Added position: {ticker}")
@@ -175,9 +313,7 @@ class PortfolioTracker:
             messagebox.showwarning("Warning", "Please select a position to edit.")
             return
         
-        item = selected[0]
-        index = self.tree.index(item)
-        position = self.portfolio[index]
+        position = self._by_iid[selected[0]]
         
         dialog = PositionDialog(self.root, "Edit Position", position)
         if dialog.result:
@@ -188,9 +324,15 @@ class PortfolioTracker:
                 messagebox.showerror("Error", f"Could not fetch data for ticker '{ticker}'. Please verify the ticker symbol.")
                 return
             
-            dialog.result['ticker'] = ticker
-            dialog.result['date_added'] = position.get('date_added', datetime.now().isoformat())
-            self.portfolio[index] = dialog.result
+            if ticker != position['ticker']:
+                self._ticker_objs.pop(position['ticker'], None)
+            
+            # Update in place so the position keeps its _id and its row
+            position.update(dialog.result)
+            position['ticker'] = ticker
+            position.setdefault('date_added', datetime.now().isoformat())
+            self._format_static_cells(position)
+            self._sync_arrays()
             self.save_data()
             self.update_display()
             self.status_var.set(f"Updated position: {ticker}")
@@ -204,90 +346,123 @@ class PortfolioTracker:
         
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this position?"):
             item = selected[0]
-            index = self.tree.index(item)
-            ticker = self.portfolio[index]['ticker']
-            del self.portfolio[index]
+            position = self._by_iid[item]
+            ticker = position['ticker']
+            self.portfolio.remove(position)
+            self.tree.delete(item)
+            del self._row_values[item]
+            self._sync_arrays()
             self.save_data()
             self.update_display()
             self.status_var.set(f"Deleted position: {ticker}")
     
-    def refresh_prices(self):
-        """Refresh all current prices"""
-        def refresh_thread():
-            self.status_var.set("Refreshing prices...")
-            # Clear cache to force refresh
-            self.price_cache.clear()
-            self.cache_timestamp.clear()
-            
-            for position in self.portfolio:
-                ticker = position['ticker']
-                price = self.get_current_price(ticker)
-                if price:
-                    self.status_var.set(f"Updated {ticker}: ${price:.2f}")
-                    time.sleep(0.5)  # Small delay to avoid rate limiting
-            
-            self.root.after(0, self.update_display)
-            self.root.after(0, lambda: self.status_var.set("Prices refreshed"))
+    def refresh_prices(self, force=True):
+        """Refresh current prices; without force, prices cached in the last 5 minutes are kept"""
+        # Clicks while a refresh is running, or soon after one that priced everything, are ignored
+        if self._refreshing:
+            self.status_var.set("Refresh already running")
+            return
+        if datetime.now() - self._last_refresh < timedelta(minutes=5):
+            self.status_var.set("Cache still fresh")
+            return
         
+        def refresh_thread():
+            # _refresh_finished must run even if the refresh fails, or _refreshing stays set
+            completed_at = None
+            try:
+                if force:
+                    # Expire every entry but keep the prices, so repaints during the refresh still show them
+                    self.cache_timestamp.clear()
+                
+                # One request for every stale ticker; get_current_price then serves
+                # from the cache and only fetches tickers the bulk download missed
+                tickers = self._unique_tickers()
+                now = datetime.now()
+                stale = [t for t in tickers
+                         if t not in self.cache_timestamp or now - self.cache_timestamp[t] >= timedelta(minutes=5)]
+                if stale:
+                    self.fetch_prices_bulk(stale)
+                
+                # Tk variables are only touched from the main loop
+                n = len(tickers)
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    for i, _ in enumerate(executor.map(self.get_current_price, tickers), 1):
+                        self.root.after(0, self._update_status, i, n)
+                
+                self.save_price_cache()
+                
+                # Only a refresh that priced every ticker holds off the next one
+                now = datetime.now()
+                complete = all(t in self.cache_timestamp and now - self.cache_timestamp[t] < timedelta(minutes=5)
+                               for t in tickers)
+                if complete:
+                    completed_at = now
+            finally:
+                self.root.after(0, self._refresh_finished, completed_at)
+        
+        # Set on the main thread before the worker starts so a second click sees it
+        self._refreshing = True
+        self.status_var.set("Refreshing prices...")
         threading.Thread(target=refresh_thread, daemon=True).start()
     
+    def _update_status(self, i, n):
+        """Report refresh progress; scheduled onto the Tk main loop by refresh_thread"""
+        self.status_var.set(f"Updated {i}/{n}")
+    
+    def _refresh_finished(self, completed_at):
+        """Repaint after a refresh; completed_at is None when some tickers could not be priced"""
+        self._refreshing = False
+        if completed_at is not None:
+            self._last_refresh = completed_at
+        self.update_display()
+        self.status_var.set("Prices refreshed" if completed_at is not None
+                            else "Prices refreshed; some tickers could not be priced")
+    
     def update_display(self):
-        """Update the portfolio display"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        total_investment = 0
-        total_current_value = 0
-        
-        for position in self.portfolio:
-            ticker = position['ticker']
-            description = position['description']
-            quantity = position['quantity']
-            purchase_price = position['purchase_price']
-            fees = position['fees']
-            
-            total_cost = (quantity * purchase_price) + fees
-            total_investment += total_cost
-            
-            current_price = self.get_current_price(ticker)
-            if current_price is not None:
-                current_value = quantity * current_price
-                total_current_value += current_value
-                pl = current_value - total_cost
-                pl_percent = (pl / total_cost) * 100 if total_cost > 0 else 0
-                
+        """Update the portfolio display from cached prices; tickers without one show N/A"""
+        prices = self._price_snapshot()
+        
+        # Whole-column arithmetic; a missing price is NaN and propagates to its row
+        current_prices = np.array([prices[p['ticker']] for p in self.portfolio], dtype=np.float64)
+        (total_costs, current_values, pls, pl_percents,
+         total_investment, total_current_value) = _compute_pnl(self.qty, self.px, self.fees, current_prices)
+        total_investment = float(total_investment)
+        total_current_value = float(total_current_value)
+        
+        rows = zip(self.portfolio, total_costs.tolist(), current_prices.tolist(),
+                   current_values.tolist(), pls.tolist(), pl_percents.tolist())
+        for position, total_cost, current_price, current_value, pl, pl_percent in rows:
+            if current_price == current_price:  # NaN when there is no price
                 # Format P&L with accounting format (red for losses)
-                pl_text = f"${abs(pl):,.2f}" if pl >= 0 else f"(${abs(pl):,.2f})"
-                pl_percent_text = f"{pl_percent:+.2f}%"
+                pl_text = _M(abs(pl)) if pl >= 0 else f"({_M(abs(pl))})"
+                pl_percent_text = _PCT(pl_percent)
                 
-                tag = 'gain' if pl >= 0 else 'loss'
+                tags = ('gain' if pl >= 0 else 'loss',)
                 
-                self.tree.insert('', tk.END, values=(
-                    description,
-                    ticker,
-                    f"{quantity:,.0f}",
-                    f"${purchase_price:.2f}",
-                    f"${total_cost:,.2f}",
-                    f"${fees:.2f}",
-                    f"${current_price:.2f}",
-                    f"${current_value:,.2f}",
+                values = position['_static_cells'] + (
+                    _P2(current_price),
+                    _M(current_value),
                     pl_text,
                     pl_percent_text
-                ), tags=(tag,))
+                )
             else:
-                self.tree.insert('', tk.END, values=(
-                    description,
-                    ticker,
-                    f"{quantity:,.0f}",
-                    f"${purchase_price:.2f}",
-                    f"${total_cost:,.2f}",
-                    f"${fees:.2f}",
-                    "N/A",
-                    "N/A",
-                    "N/A",
-                    "N/A"
-                ))
+                tags = ()
+                values = position['_static_cells'] + ("N/A", "N/A", "N/A", "N/A")
+            
+            # Update existing rows in place and only when they changed
+            iid = position['_id']
+            row = (values, tags)
+            previous = self._row_values.get(iid)
+            if previous is None:
+                self.tree.insert('', tk.END, iid=iid, values=values, tags=tags)
+            elif previous != row:
+                self.tree.item(iid, values=values, tags=tags)
+            self._row_values[iid] = row
+        
+        # Remove rows whose position is gone
+        for iid in [iid for iid in self._row_values if iid not in self._by_iid]:
+            self.tree.delete(iid)
+            del self._row_values[iid]
         
         # Update summary
         self.total_investment_var.set(f"${total_investment:,.2f}")
@@ -308,8 +483,18 @@ class PortfolioTracker:
     def save_data(self):
         """Save portfolio data to JSON file"""
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.portfolio, f, indent=2)
+            # Keys starting with "_" are display caches, not portfolio data
+            portfolio = [{k: v for k, v in p.items() if not k.startswith('_')}
+                         for p in self.portfolio]
+            if orjson is not None:
+                data = orjson.dumps(portfolio, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(portfolio, indent=2).encode()
+            # Write a temp file and swap it in so a crash never leaves a truncated file
+            tmp = self.data_file + ".tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.data_file)
         except Exception as e:
             messagebox.showerror("Error", f"Could not save data: {e}")
     
@@ -322,6 +507,31 @@ class PortfolioTracker:
             except Exception as e:
                 messagebox.showerror("Error", f"Could not load data: {e}")
                 self.portfolio = []
+        # Row ids for the Treeview; like the cached cells they are not saved
+        for position in self.portfolio:
+            position['_id'] = uuid.uuid4().hex
+            self._format_static_cells(position)
+        
+        # Prices from the last run; get_current_price ignores entries older than 5 minutes
+        if os.path.exists(self._cache_path):
+            try:
+                with open(self._cache_path, 'r') as f:
+                    for ticker, (price, timestamp) in json.load(f).items():
+                        self.price_cache[ticker] = price
+                        self.cache_timestamp[ticker] = datetime.fromisoformat(timestamp)
+            except Exception as e:
+                print(f"Error loading price cache: {e}")
+    
+    def save_price_cache(self):
+        """Save cached prices with their fetch times so the next start can reuse them"""
+        try:
+            cache = {ticker: [price, self.cache_timestamp[ticker].isoformat()]
+                     for ticker, price in list(self.price_cache.items())
+                     if ticker in self.cache_timestamp}
+            with open(self._cache_path, 'w') as f:
+                json.dump(cache, f)
+        except Exception as e:
+            print(f"Error saving price cache: {e}")
     
     def export_data(self):
         """Export portfolio data to CSV"""
@@ -329,38 +539,29 @@ class PortfolioTracker:
             import csv
             filename = f"portfolio_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
-            with open(filename, 'w', newline='') as csvfile:
-                fieldnames = ['Description', 'Ticker', 'Quantity', 'Purchase Price', 'Total Cost', 'Fees', 'Current Price', 'Current Value', 'P&L', 'P&L %']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+            fieldnames = ('Description', 'Ticker', 'Quantity', 'Purchase Price', 'Total Cost', 'Fees', 'Current Price', 'Current Value', 'P&L', 'P&L %')
+            # Export what the table shows: cached prices only, never a network call
+            rows = [fieldnames]
+            for position in self.portfolio:
+                ticker = position['ticker']
+                current_price = self.price_cache.get(ticker)
+                quantity = position['quantity']
+                purchase_price = position['purchase_price']
+                fees = position['fees']
+                total_cost = (quantity * purchase_price) + fees
                 
-                for position in self.portfolio:
-                    ticker = position['ticker']
-                    current_price = self.get_current_price(ticker)
-                    quantity = position['quantity']
-                    purchase_price = position['purchase_price']
-                    fees = position['fees']
-                    total_cost = (quantity * purchase_price) + fees
-                    
-                    if current_price:
-                        current_value = quantity * current_price
-                        pl = current_value - total_cost
-                        pl_percent = (pl / total_cost) * 100 if total_cost > 0 else 0
-                    else:
-                        current_price = current_value = pl = pl_percent = "N/A"
-                    
-                    writer.writerow({
-                        'Description': position['description'],
-                        'Ticker': ticker,
-                        'Quantity': quantity,
-                        'Purchase Price': purchase_price,
-                        'Total Cost': total_cost,
-                        'Fees': fees,
-                        'Current Price': current_price,
-                        'Current Value': current_value,
-                        'P&L': pl,
-                        'P&L %': pl_percent
-                    })
+                if current_price:
+                    current_value = quantity * current_price
+                    pl = current_value - total_cost
+                    pl_percent = (pl / total_cost) * 100 if total_cost > 0 else 0
+                else:
+                    current_price = current_value = pl = pl_percent = "N/A"
+                
+                rows.append((position['description'], ticker, quantity, purchase_price, total_cost,
+                             fees, current_price, current_value, pl, pl_percent))
+            
+            with open(filename, 'w', newline='') as csvfile:
+                csv.writer(csvfile).writerows(rows)
             
             messagebox.showinfo("Export Successful", f"Data exported to {filename}")
         except Exception as e:
@@ -471,15 +672,11 @@ class PositionDialog:
 
 
 if __name__ == "__main__":
-    # Check if required packages are installed
-    try:
-        import yfinance
-    except ImportError:
-        print("Installing required package: yfinance")
-        import subprocess
+    # Check that yfinance is installed without paying for its import at startup
+    import importlib.util
+    if importlib.util.find_spec("yfinance") is None:
         import sys
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "yfinance"])
-        import yfinance
+        sys.exit("Install yfinance first: pip install yfinance")
     
     root = tk.Tk()
     app = PortfolioTracker(root)
@@ -1,46 +1,253 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request
+from flask.json.provider import JSONProvider
 import yfinance as yf
-import json
+import numpy as np
+import orjson
 import os
+import atexit
+import hashlib
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 import csv
 import io
-from threading import Lock
+from threading import Condition, Event, Lock, Thread, Timer
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (compact output, native numpy/datetime)"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Compress the page, API responses and the (streamed) CSV export when Flask-Compress is installed
+if Compress is not None:
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/csv']
+    Compress(app)
+
+def json_response(payload):
+    """Serialize straight to bytes, skipping the provider's str round-trip"""
+    return app.response_class(orjson.dumps(payload, option=ORJSON_OPTIONS), mimetype='application/json')
+
+# Yahoo Finance rejects overly long symbol lists, so bulk downloads are chunked
+BULK_DOWNLOAD_CHUNK = 20
+
+# Mutations within this window are coalesced into a single write
+SAVE_DELAY_SECONDS = 1.0
+
+# The data file is written compact; set PORTFOLIO_PRETTY=1 to indent it for reading
+SAVE_OPTIONS = orjson.OPT_INDENT_2 if os.getenv("PORTFOLIO_PRETTY") else None
+
+# How long a serialized /api/portfolio response may be reused
+RESPONSE_CACHE_TTL = timedelta(seconds=60)
+
+# Tickers Yahoo returned nothing for are not retried within this window
+NEGATIVE_CACHE_TTL = timedelta(seconds=60)
+
+# Background refresh runs inside the 5 minute price TTL so the cache stays warm
+REFRESH_INTERVAL_SECONDS = 240
+
+# How long a manual refresh request waits for the refresher to finish its pass
+REFRESH_WAIT_SECONDS = 15
+
+def _compute_positions(qty, px, fees, cur):
+    """Per-position total cost, current value, P&L and P&L % from float64 columns"""
+    total_cost = qty * px + fees
+    current_value = qty * cur
+    pl = current_value - total_cost
+    # Divide by a safe denominator so zero-cost rows never raise or warn
+    safe_cost = np.where(total_cost > 0, total_cost, 1.0)
+    pl_percent = np.where(total_cost > 0, 100.0 * pl / safe_cost, 0.0)
+    return total_cost, current_value, pl, pl_percent
+
+# numba is optional; without it the kernel runs as plain NumPy.
+# fastmath stays off because missing prices are carried as NaN.
+if njit is not None:
+    _compute_positions = njit(cache=True)(_compute_positions)
+
+@dataclass(slots=True)
+class Position:
+    """A single holding as stored in portfolio_data.json"""
+    id: int
+    description: str
+    ticker: str
+    quantity: float
+    purchase_price: float
+    fees: float
+    date_added: str
 
 class PortfolioManager:
-    def __init__(self):
+    def __init__(self, max_workers=8):
         self.data_file = "portfolio_data.json"
         self.portfolio = []
+        self.portfolio_by_id = {}
+        self._cost_basis_sum = 0.0
+        # Held while positions or the cost basis change, and while a read snapshots them
+        self.portfolio_lock = Lock()
         self.price_cache = {}
         self.cache_timestamp = {}
-        self.lock = Lock()
+        self.negative_cache = {}
+        self.cache_lock = Lock()
+        self.ticker_locks = {}
+        self.max_workers = max_workers
+        self.save_lock = Lock()
+        self._save_timer = None
+        self._dirty = False
+        self._last_saved_hash = None
+        self._portfolio_version = 0
+        self._response_cache = None
+        self._refresh_event = Event()
+        # Refresher passes are numbered; waiters compare against these under _refresh_done
+        self._refresh_done = Condition()
+        self._refresh_started = 0
+        self._refresh_finished = 0
+        self._refresh_error = None
+        self._refreshed_tickers = set()
         self.load_data()
+        atexit.register(self.flush)
+        Thread(target=self._background_refresher, daemon=True).start()
+    
+    def _cached_price(self, ticker, now):
+        """Return (found, price) from the price or negative cache; caller holds cache_lock"""
+        if ticker in self.price_cache and ticker in self.cache_timestamp:
+            if now - self.cache_timestamp[ticker] < timedelta(minutes=5):
+                return True, self.price_cache[ticker]
+        failed_at = self.negative_cache.get(ticker)
+        if failed_at is not None and now - failed_at < NEGATIVE_CACHE_TTL:
+            return True, None
+        return False, None
     
     def get_current_price(self, ticker):
         """Get current price from Yahoo Finance with caching"""
-        with self.lock:
-            now = datetime.now()
-            
-            # Check cache (refresh every 5 minutes)
-            if ticker in self.price_cache and ticker in self.cache_timestamp:
-                if now - self.cache_timestamp[ticker] < timedelta(minutes=5):
-                    return self.price_cache[ticker]
+        now = datetime.now()
+        
+        with self.cache_lock:
+            found, cached = self._cached_price(ticker, now)
+            ticker_lock = self.ticker_locks.setdefault(ticker, Lock())
+        if found:
+            return cached
+        
+        # Only lookups of the same ticker wait on each other; whoever wins
+        # the lock fetches, the rest pick the result up from the re-check
+        with ticker_lock:
+            with self.cache_lock:
+                found, cached = self._cached_price(ticker, datetime.now())
+            if found:
+                return cached
             
             try:
+                # Skip dividend/split columns and price adjustment; only the raw last close is used
                 stock = yf.Ticker(ticker)
-                hist = stock.history(period="1d")
-                if not hist.empty:
-                    current_price = float(hist['Close'].iloc[-1])
-                    self.price_cache[ticker] = current_price
-                    self.cache_timestamp[ticker] = now
-                    return current_price
-                else:
+                hist = stock.history(period="1d", auto_adjust=False, actions=False, timeout=5)
+                if hist.empty:
+                    with self.cache_lock:
+                        self.negative_cache[ticker] = datetime.now()
                     return None
+                current_price = float(hist['Close'].iloc[-1])
             except Exception as e:
                 print(f"Error fetching price for {ticker}: {e}")
                 return None
+            
+            with self.cache_lock:
+                self.price_cache[ticker] = current_price
+                self.cache_timestamp[ticker] = datetime.now()
+                self.negative_cache.pop(ticker, None)
+            return current_price
+    
+    def _refresh_prices_bulk(self, tickers):
+        """Fetch prices for many tickers with one Yahoo Finance request per chunk"""
+        for start in range(0, len(tickers), BULK_DOWNLOAD_CHUNK):
+            chunk = tickers[start:start + BULK_DOWNLOAD_CHUNK]
+            try:
+                df = yf.download(chunk, period="1d", group_by="ticker", threads=True, progress=False)
+            except Exception as e:
+                print(f"Error fetching prices for {', '.join(chunk)}: {e}")
+                continue
+            
+            if df.empty:
+                continue
+            
+            prices = {}
+            for ticker in chunk:
+                try:
+                    closes = (df[ticker] if df.columns.nlevels > 1 else df)['Close'].dropna()
+                except KeyError:
+                    continue
+                if not closes.empty:
+                    prices[ticker] = float(closes.iloc[-1])
+            
+            now = datetime.now()
+            with self.cache_lock:
+                for ticker, price in prices.items():
+                    self.price_cache[ticker] = price
+                    self.cache_timestamp[ticker] = now
+                    self.negative_cache.pop(ticker, None)
+    
+    def _unique_tickers(self):
+        """Sorted, de-duplicated tickers held in the portfolio"""
+        return sorted({p.ticker for p in self.portfolio})
+    
+    def _background_refresher(self):
+        """Re-fetch every held ticker periodically, or as soon as a refresh is requested"""
+        while True:
+            with self._refresh_done:
+                self._refresh_event.clear()
+                self._refresh_started += 1
+                number = self._refresh_started
+            
+            # A failed pass must not end the thread; it is the only thing refreshing prices
+            error = None
+            try:
+                tickers = self._unique_tickers()
+                if tickers:
+                    self._refresh_prices_bulk(tickers)
+                    with self.cache_lock:
+                        self._refreshed_tickers.update(tickers)
+                    # New prices invalidate the cached response and the ETag
+                    with self.portfolio_lock:
+                        self._portfolio_version += 1
+            except Exception as e:
+                print(f"Error refreshing prices: {e}")
+                error = e
+            finally:
+                with self._refresh_done:
+                    self._refresh_finished = number
+                    self._refresh_error = error
+                    self._refresh_done.notify_all()
+            self._refresh_event.wait(REFRESH_INTERVAL_SECONDS)
+    
+    def _wait_for_refresh(self, join_running=False):
+        """Wait for a refresher pass that starts after this call, or with join_running
+        for the one already under way; returns False if it doesn't finish in time"""
+        with self._refresh_done:
+            target = self._refresh_started + 1
+            if join_running and self._refresh_started != self._refresh_finished:
+                target -= 1
+            else:
+                self._refresh_event.set()
+            return self._refresh_done.wait_for(lambda: self._refresh_finished >= target,
+                                               timeout=REFRESH_WAIT_SECONDS)
+    
+    @staticmethod
+    def _cost_basis(position):
+        """Total cost of a position including fees"""
+        return (position.quantity * position.purchase_price) + position.fees
     
     def add_position(self, position_data):
         """Add a new position to the portfolio"""
@@ -49,93 +256,138 @@ class PortfolioManager:
         if current_price is None:
             return False, f"Could not fetch data for ticker '{position_data['ticker']}'"
         
-        position = {
-            'id': len(self.portfolio) + 1,
-            'description': position_data['description'],
-            'ticker': position_data['ticker'].upper(),
-            'quantity': float(position_data['quantity']),
-            'purchase_price': float(position_data['purchase_price']),
-            'fees': float(position_data['fees']),
-            'date_added': datetime.now().isoformat()
-        }
+        description = position_data['description']
+        ticker = position_data['ticker'].upper()
+        quantity = float(position_data['quantity'])
+        purchase_price = float(position_data['purchase_price'])
+        fees = float(position_data['fees'])
         
-        self.portfolio.append(position)
-        self.save_data()
+        with self.portfolio_lock:
+            position = Position(
+                id=max(self.portfolio_by_id, default=0) + 1,
+                description=description,
+                ticker=ticker,
+                quantity=quantity,
+                purchase_price=purchase_price,
+                fees=fees,
+                date_added=datetime.now().isoformat()
+            )
+            
+            self.portfolio.append(position)
+            self.portfolio_by_id[position.id] = position
+            self._cost_basis_sum += self._cost_basis(position)
+            self._portfolio_version += 1
+        self._schedule_save()
         return True, "Position added successfully"
     
     def edit_position(self, position_id, position_data):
         """Edit an existing position"""
-        for i, position in enumerate(self.portfolio):
-            if position['id'] == position_id:
-                # Validate ticker if changed
-                new_ticker = position_data['ticker'].upper()
-                if new_ticker != position['ticker']:
-                    current_price = self.get_current_price(new_ticker)
-                    if current_price is None:
-                        return False, f"Could not fetch data for ticker '{new_ticker}'"
-                
-                # Update position
-                position.update({
-                    'description': position_data['description'],
-                    'ticker': new_ticker,
-                    'quantity': float(position_data['quantity']),
-                    'purchase_price': float(position_data['purchase_price']),
-                    'fees': float(position_data['fees'])
-                })
-                
-                self.save_data()
-                return True, "Position updated successfully"
+        position = self.portfolio_by_id.get(position_id)
+        if position is None:
+            return False, "Position not found"
         
-        return False, "Position not found"
+        # Validate ticker if changed
+        new_ticker = position_data['ticker'].upper()
+        if new_ticker != position.ticker:
+            current_price = self.get_current_price(new_ticker)
+            if current_price is None:
+                return False, f"Could not fetch data for ticker '{new_ticker}'"
+        
+        description = position_data['description']
+        quantity = float(position_data['quantity'])
+        purchase_price = float(position_data['purchase_price'])
+        fees = float(position_data['fees'])
+        
+        # Update position
+        with self.portfolio_lock:
+            if self.portfolio_by_id.get(position_id) is not position:
+                return False, "Position not found"
+            self._cost_basis_sum -= self._cost_basis(position)
+            position.description = description
+            position.ticker = new_ticker
+            position.quantity = quantity
+            position.purchase_price = purchase_price
+            position.fees = fees
+            self._cost_basis_sum += self._cost_basis(position)
+            self._portfolio_version += 1
+        
+        self._schedule_save()
+        return True, "Position updated successfully"
     
     def delete_position(self, position_id):
         """Delete a position"""
-        for i, position in enumerate(self.portfolio):
-            if position['id'] == position_id:
-                del self.portfolio[i]
-                self.save_data()
-                return True, "Position deleted successfully"
-        
-        return False, "Position not found"
+        with self.portfolio_lock:
+            position = self.portfolio_by_id.pop(position_id, None)
+            if position is None:
+                return False, "Position not found"
+            
+            self.portfolio.remove(position)
+            self._cost_basis_sum -= self._cost_basis(position)
+            self._portfolio_version += 1
+        self._schedule_save()
+        return True, "Position deleted successfully"
     
     def get_portfolio_data(self):
         """Get portfolio data with current prices and calculations"""
         portfolio_data = []
-        total_investment = 0
-        total_current_value = 0
-        
-        for position in self.portfolio:
-            ticker = position['ticker']
-            quantity = position['quantity']
-            purchase_price = position['purchase_price']
-            fees = position['fees']
-            
-            total_cost = (quantity * purchase_price) + fees
-            total_investment += total_cost
-            
-            current_price = self.get_current_price(ticker)
-            
-            if current_price is not None:
-                current_value = quantity * current_price
-                total_current_value += current_value
-                pl = current_value - total_cost
-                pl_percent = (pl / total_cost) * 100 if total_cost > 0 else 0
-            else:
-                current_value = pl = pl_percent = None
-            
+        
+        # Work from one snapshot so a concurrent add/edit/delete can't leave the
+        # tickers, arrays, rows and cost basis disagreeing; edits mutate positions
+        # in place, so the positions are copied too
+        with self.portfolio_lock:
+            positions = [replace(p) for p in self.portfolio]
+            total_investment = self._cost_basis_sum
+        
+        # The background refresher keeps cached prices current, so a read serves
+        # them as they are and only fetches tickers that have never been priced
+        unique_tickers = sorted({p.ticker for p in positions})
+        now = datetime.now()
+        with self.cache_lock:
+            unpriced = [t for t in unique_tickers
+                        if t not in self.price_cache and not self._cached_price(t, now)[0]]
+            unseen = any(t not in self._refreshed_tickers for t in unpriced)
+        if unpriced:
+            # Tickers no pass has tried yet (e.g. right after startup) are left to
+            # the refresher, joining its current pass rather than downloading twice
+            if unseen:
+                self._wait_for_refresh(join_running=True)
+            # Anything the bulk download missed falls back to a single-ticker fetch
+            with self.cache_lock:
+                missing = [t for t in unpriced if t not in self.price_cache]
+            if missing:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as ex:
+                    list(ex.map(self.get_current_price, missing))
+        
+        with self.cache_lock:
+            prices = {t: self.price_cache.get(t) for t in unique_tickers}
+        
+        # Column arrays for the arithmetic; a missing price becomes NaN
+        qty = np.array([p.quantity for p in positions], dtype=np.float64)
+        px = np.array([p.purchase_price for p in positions], dtype=np.float64)
+        fees = np.array([p.fees for p in positions], dtype=np.float64)
+        cur = np.array([prices[p.ticker] for p in positions], dtype=np.float64)
+        
+        total_cost, current_value, pl, pl_percent = _compute_positions(qty, px, fees, cur)
+        
+        total_current_value = float(np.nansum(current_value))
+        
+        for position, row_cost, row_price, row_value, row_pl, row_pl_percent in zip(
+                positions, total_cost.tolist(), cur.tolist(), current_value.tolist(),
+                pl.tolist(), pl_percent.tolist()):
+            priced = row_price == row_price  # NaN != NaN
             portfolio_data.append({
-                'id': position['id'],
-                'description': position['description'],
-                'ticker': ticker,
-                'quantity': quantity,
-                'purchase_price': purchase_price,
-                'total_cost': total_cost,
-                'fees': fees,
-                'current_price': current_price,
-                'current_value': current_value,
-                'pl': pl,
-                'pl_percent': pl_percent,
-                'date_added': position['date_added']
+                'id': position.id,
+                'description': position.description,
+                'ticker': position.ticker,
+                'quantity': position.quantity,
+                'purchase_price': position.purchase_price,
+                'total_cost': row_cost,
+                'fees': position.fees,
+                'current_price': row_price if priced else None,
+                'current_value': row_value if priced else None,
+                'pl': row_pl if priced else None,
+                'pl_percent': row_pl_percent if priced else None,
+                'date_added': position.date_added
             })
         
         # Calculate totals
@@ -151,17 +403,71 @@ class PortfolioManager:
         
         return portfolio_data, summary
     
+    def get_portfolio_json(self):
+        """Serialized portfolio response, reused while the portfolio is unchanged"""
+        now = datetime.now()
+        cached = self._response_cache
+        if cached is not None:
+            version, created, body = cached
+            if version == self._portfolio_version and now - created < RESPONSE_CACHE_TTL:
+                return body
+        
+        # Capture the version first so a mutation during the build invalidates the result
+        version = self._portfolio_version
+        portfolio_data, summary = self.get_portfolio_data()
+        body = orjson.dumps({
+            'success': True,
+            'portfolio': portfolio_data,
+            'summary': summary
+        }, option=ORJSON_OPTIONS)
+        self._response_cache = (version, now, body)
+        return body
+    
+    def portfolio_etag(self, now):
+        """ETag value that changes with every mutation and at least once a minute"""
+        return f"{self._portfolio_version}-{int(now.timestamp() // 60)}"
+    
     def refresh_all_prices(self):
-        """Clear cache to force price refresh"""
-        with self.lock:
-            self.price_cache.clear()
-            self.cache_timestamp.clear()
+        """Wake the background refresher and wait briefly for a pass started after the request"""
+        if not self._wait_for_refresh():
+            return False
+        if self._refresh_error is not None:
+            raise RuntimeError(f"Price refresh failed: {self._refresh_error}")
+        return True
+    
+    def _schedule_save(self):
+        """Mark the portfolio dirty and start the debounce timer if it isn't running"""
+        with self.save_lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = Timer(SAVE_DELAY_SECONDS, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes to disk immediately"""
+        with self.save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._dirty = False
+                self.save_data()
     
     def save_data(self):
         """Save portfolio data to JSON file"""
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.portfolio, f, indent=2)
+            data = orjson.dumps(self.portfolio, option=SAVE_OPTIONS)
+            digest = hashlib.blake2b(data).digest()
+            if digest == self._last_saved_hash:
+                return
+            
+            # Write to a temp file and swap it in so a crash never truncates the data file
+            tmp_file = self.data_file + ".tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, self.data_file)
+            self._last_saved_hash = digest
         except Exception as e:
             print(f"Error saving data: {e}")
     
@@ -169,11 +475,13 @@ class PortfolioManager:
         """Load portfolio data from JSON file"""
         if os.path.exists(self.data_file):
             try:
-                with open(self.data_file, 'r') as f:
-                    self.portfolio = json.load(f)
+                with open(self.data_file, 'rb') as f:
+                    self.portfolio = [Position(**p) for p in orjson.loads(f.read())]
             except Exception as e:
                 print(f"Error loading data: {e}")
                 self.portfolio = []
+        self.portfolio_by_id = {p.id: p for p in self.portfolio}
+        self._cost_basis_sum = sum(self._cost_basis(p) for p in self.portfolio)
 
 # Initialize portfolio manager
 portfolio_manager = PortfolioManager()
@@ -187,14 +495,16 @@ def index():
 def get_portfolio():
     """API endpoint to get portfolio data"""
     try:
-        portfolio_data, summary = portfolio_manager.get_portfolio_data()
-        return jsonify({
-            'success': True,
-            'portfolio': portfolio_data,
-            'summary': summary
-        })
+        etag = portfolio_manager.portfolio_etag(datetime.now())
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(portfolio_manager.get_portfolio_json(), mimetype='application/json')
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, max-age=30'
+        return response
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 @app.route('/api/position', methods=['POST'])
 def add_position():
@@ -202,9 +512,9 @@ def add_position():
     try:
         data = request.json
         success, message = portfolio_manager.add_position(data)
-        return jsonify({'success': success, 'message': message})
+        return json_response({'success': success, 'message': message})
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 @app.route('/api/position/<int:position_id>', methods=['PUT'])
 def edit_position(position_id):
@@ -212,27 +522,28 @@ def edit_position(position_id):
     try:
         data = request.json
         success, message = portfolio_manager.edit_position(position_id, data)
-        return jsonify({'success': success, 'message': message})
+        return json_response({'success': success, 'message': message})
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 @app.route('/api/position/<int:position_id>', methods=['DELETE'])
 def delete_position(position_id):
     """API endpoint to delete a position"""
     try:
         success, message = portfolio_manager.delete_position(position_id)
-        return jsonify({'success': success, 'message': message})
+        return json_response({'success': success, 'message': message})
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 @app.route('/api/refresh-prices', methods=['POST'])
 def refresh_prices():
     """API endpoint to refresh all prices"""
     try:
-        portfolio_manager.refresh_all_prices()
-        return jsonify({'success': True, 'message': 'Prices refreshed successfully'})
+        if portfolio_manager.refresh_all_prices():
+            return json_response({'success': True, 'message': 'Prices refreshed successfully'})
+        return json_response({'success': True, 'message': 'Price refresh is still running'})
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 @app.route('/api/export')
 def export_data():
@@ -240,47 +551,46 @@ def export_data():
     try:
         portfolio_data, summary = portfolio_manager.get_portfolio_data()
         
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Description', 'Ticker', 'Quantity', 'Purchase Price', 'Total Cost',
-            'Fees', 'Current Price', 'Current Value', 'P&L', 'P&L %', 'Date Added'
-        ])
-        
-        # Write data
-        for position in portfolio_data:
+        def generate():
+            # Reuse one small buffer and flush it after every row
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            
+            # Write header
             writer.writerow([
-                position['description'],
-                position['ticker'],
-                position['quantity'],
-                position['purchase_price'],
-                position['total_cost'],
-                position['fees'],
-                position['current_price'] if position['current_price'] else 'N/A',
-                position['current_value'] if position['current_value'] else 'N/A',
-                position['pl'] if position['pl'] else 'N/A',
-                f"{position['pl_percent']:.2f}%" if position['pl_percent'] else 'N/A',
-                position['date_added']
+                'Description', 'Ticker', 'Quantity', 'Purchase Price', 'Total Cost',
+                'Fees', 'Current Price', 'Current Value', 'P&L', 'P&L %', 'Date Added'
             ])
-        
-        # Create file-like object
-        output.seek(0)
-        csv_data = output.getvalue()
-        output.close()
+            yield buffer.getvalue()
+            
+            # Write data
+            for position in portfolio_data:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow([
+                    position['description'],
+                    position['ticker'],
+                    position['quantity'],
+                    position['purchase_price'],
+                    position['total_cost'],
+                    position['fees'],
+                    position['current_price'] if position['current_price'] else 'N/A',
+                    position['current_value'] if position['current_value'] else 'N/A',
+                    position['pl'] if position['pl'] else 'N/A',
+                    f"{position['pl_percent']:.2f}%" if position['pl_percent'] else 'N/A',
+                    position['date_added']
+                ])
+                yield buffer.getvalue()
         
         # Return as downloadable file
         filename = f"portfolio_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return send_file(
-            io.BytesIO(csv_data.encode()),
+        return Response(
+            generate(),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=filename
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
     except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        return json_response({'success': False, 'message': str(e)})
 
 # Create templates directory and HTML template
 def create_template():
@@ -600,8 +910,9 @@ def create_template():
             loadPortfolio();
         };
         
-        function loadPortfolio() {
-            fetch('/api/portfolio')
+        // After a change, revalidate instead of reusing the browser's cached copy
+        function loadPortfolio(revalidate = false) {
+            fetch('/api/portfolio', { cache: revalidate ? 'no-cache' : 'default' })
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
@@ -639,6 +950,8 @@ def create_template():
             
             portfolio.forEach(position => {
                 const row = document.createElement('tr');
+                row.dataset.id = position.id;
+                row.dataset.position = JSON.stringify(position);
                 
                 const pl = position.pl;
                 const plClass = pl >= 0 ? 'gain' : 'loss';
@@ -692,24 +1005,19 @@ def create_template():
         }
         
         function editPosition(id) {
-            // Find position data
-            fetch('/api/portfolio')
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        const position = data.portfolio.find(p => p.id === id);
-                        if (position) {
-                            currentEditId = id;
-                            document.getElementById('modalTitle').textContent = 'Edit Position';
-                            document.getElementById('description').value = position.description;
-                            document.getElementById('ticker').value = position.ticker;
-                            document.getElementById('quantity').value = position.quantity;
-                            document.getElementById('purchase_price').value = position.purchase_price;
-                            document.getElementById('fees').value = position.fees;
-                            document.getElementById('positionModal').style.display = 'block';
-                        }
-                    }
-                });
+            // Read position data off the row that is already rendered
+            const row = document.querySelector(`tr[data-id="${id}"]`);
+            if (row) {
+                const position = JSON.parse(row.dataset.position);
+                currentEditId = id;
+                document.getElementById('modalTitle').textContent = 'Edit Position';
+                document.getElementById('description').value = position.description;
+                document.getElementById('ticker').value = position.ticker;
+                document.getElementById('quantity').value = position.quantity;
+                document.getElementById('purchase_price').value = position.purchase_price;
+                document.getElementById('fees').value = position.fees;
+                document.getElementById('positionModal').style.display = 'block';
+            }
         }
         
         function deletePosition(id) {
@@ -719,7 +1027,7 @@ def create_template():
                     .then(data => {
                         if (data.success) {
                             showStatus(data.message, 'success');
-                            loadPortfolio();
+                            loadPortfolio(true);
                         } else {
                             showStatus('Error: ' + data.message, 'error');
                         }
@@ -738,7 +1046,7 @@ def create_template():
                 .then(data => {
                     if (data.success) {
                         showStatus(data.message, 'success');
-                        loadPortfolio();
+                        loadPortfolio(true);
                     } else {
                         showStatus('Error: ' + data.message, 'error');
                     }
@@ -771,7 +1079,7 @@ def create_template():
                 if (data.success) {
                     showStatus(data.message, 'success');
                     closeModal();
-                    loadPortfolio();
+                    loadPortfolio(true);
                 } else {
                     showStatus('Error: ' + data.message, 'error');
                 }
@@ -807,5 +1115,12 @@ if __name__ == "__main__":
     
     print("Starting Portfolio Tracker...")
     print("Open your browser and go to: http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    try:
+        from waitress import serve
+    except ImportError:
+        print("waitress is not installed; using the Flask development server")
+        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+    else:
+        # Threaded production server so slow price fetches don't block other requests
+        serve(app, host='0.0.0.0', port=5000, threads=16)
     
\ No newline at end of file